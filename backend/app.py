@@ -6,14 +6,32 @@ Provides REST API endpoints for the React frontend to interact with MongoDB via
 
 import os
 import sys
+import ast
+import asyncio
+import copy
 import json
 import logging
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from datetime import datetime
+from itertools import islice
 from pathlib import Path
+import orjson
+from cachetools import TTLCache
 from pymongo import MongoClient
+from pymongo.cursor import Cursor
+from pymongo.command_cursor import CommandCursor
+from bson import ObjectId, json_util
+from bson.errors import BSONError, InvalidId
 from dotenv import load_dotenv
-from bson import ObjectId
+from typing import Any
 from typing_extensions import TypedDict, Annotated
 from langchain.chat_models import init_chat_model
+from langchain_core.globals import set_llm_cache
+from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_community.cache import SQLiteCache
 from langgraph import graph as langgraph
 
 # Load environment variables
@@ -34,8 +52,6 @@ if not settings.configured:
         ROOT_URLCONF=__name__,
         ALLOWED_HOSTS=['*'],
         INSTALLED_APPS=[
-            'django.contrib.contenttypes',
-            'django.contrib.auth',
             'corsheaders',
         ],
         MIDDLEWARE=[
@@ -76,22 +92,99 @@ if not settings.configured:
 import django
 django.setup()
 
-from django.http import JsonResponse
+from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.urls import path
 from django.core.wsgi import get_wsgi_application
+from django.core.asgi import get_asgi_application
+
+class ORJsonResponse(HttpResponse):
+    """JSON response serialized with orjson; non-JSON types fall back to str()."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(
+            orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS),
+            **kwargs,
+        )
 
 # Global variables for LLM and graph
 llm = None
+structured_llm = None
 graph = None
+exec_graph = None
+
+# Shared MongoDB client (PyMongo pools connections internally)
+MONGO_DB_NAME = "app-dev"
+_MONGO_CLIENT = None
+_MONGO_DB = None
+
+# Upper bound on documents materialized from a single query
+MAX_RESULTS = int(os.getenv("MAX_RESULTS", "10000"))
+CURSOR_BATCH_SIZE = 500
+
+# Documents returned (and summarized) by the execute-query endpoint
+EXECUTE_RESULT_LIMIT = 10
+
+# Methods a generated query may call: one collection read, then cursor modifiers
+QUERY_COLLECTION_METHODS = {"find", "find_one", "count_documents", "aggregate"}
+QUERY_CURSOR_METHODS = {"sort", "limit", "skip"}
+QUERY_WRITE_STAGES = {"$out", "$merge"}
+# Constructors allowed inside query arguments, built directly from literals
+QUERY_VALUE_CONSTRUCTORS = {"ObjectId": ObjectId, "datetime": datetime}
+
+# Short-lived cache of query results, keyed on the parsed query plan. The
+# cache is sized in documents (non-list results count as one), and results
+# larger than QUERY_CACHE_MAX_ENTRY_DOCS are never cached.
+QUERY_CACHE_TTL = 30
+QUERY_CACHE_MAX_DOCS = 20000
+QUERY_CACHE_MAX_ENTRY_DOCS = 1000
+QUERY_NONDETERMINISTIC_OPS = ("$sample", "$rand")
+_QUERY_CACHE = TTLCache(
+    maxsize=QUERY_CACHE_MAX_DOCS,
+    ttl=QUERY_CACHE_TTL,
+    getsizeof=lambda result: max(len(result), 1) if isinstance(result, list) else 1,
+)
+_QUERY_CACHE_LOCK = threading.Lock()
+_CACHE_MISS = object()
+
+# On-disk cache for LLM responses, keyed on the exact prompt
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".langchain.db")
+
+# Schema snapshot cache for get_collection_info()
+COLLECTION_INFO_TTL = 60
+COLLECTION_SAMPLE_WORKERS = 16
+COLLECTION_SAMPLE_PIPELINE = [
+    {"$sample": {"size": 2}},
+    {"$project": {
+        "_id": 0,
+        "fields": {"$map": {
+            "input": {"$objectToArray": "$$ROOT"},
+            "as": "field",
+            "in": {"k": "$$field.k", "t": {"$type": "$$field.v"}},
+        }},
+    }},
+]
+# Immutable (collection_info, schema_json, built_at) tuple, swapped in one
+# assignment; the lock makes concurrent misses share a single re-sample
+_COLLECTION_SNAPSHOT = None
+_COLLECTION_SNAPSHOT_LOCK = threading.Lock()
 
 # LangGraph State and Output Types
 class State(TypedDict):
     question: str
     query: str
-    result: str
+    result: Any
     answer: str
+    error: str
+    result_limit: int
+
+class ResultTooLargeError(Exception):
+    """Raised when a query returns more than MAX_RESULTS documents."""
+
+class QueryError(ValueError):
+    """Raised when a generated query is not an allowed read expression."""
 
 class QueryOutput(TypedDict):
     """Generated MongoDB query."""
@@ -99,142 +192,382 @@ class QueryOutput(TypedDict):
 
 # MongoDB connection functions
 def get_mongo_client():
-    """Get MongoDB client connection."""
-    mongo_uri = os.getenv("MONGO_URI")
-    if not mongo_uri:
-        raise ValueError("MONGO_URI not set in environment variables.")
-    return MongoClient(mongo_uri)
-
-def get_collection_info():
-    """Get information about available collections and their structure."""
-    try:
-        client = get_mongo_client()
-        db = client["app-dev"]
-        
-        collection_names = db.list_collection_names()
-        collection_info = {}
-        
-        for collection_name in collection_names:
-            collection = db[collection_name]
-            # Get sample documents to understand structure
-            sample_docs = list(collection.find().limit(2))
-            if sample_docs:
-                # Get all unique keys from sample documents
-                all_keys = set()
-                for doc in sample_docs:
-                    all_keys.update(doc.keys())
-                collection_info[collection_name] = {
-                    "fields": list(all_keys),
-                    "sample_document": sample_docs[0] if sample_docs else None,
-                    "document_count": collection.count_documents({})
-                }
-            else:
-                collection_info[collection_name] = {
-                    "fields": [],
-                    "sample_document": None,
-                    "document_count": 0
-                }
-        
-        return collection_info
-    except Exception as e:
-        logger.error(f"Error getting collection info: {e}")
-        return {}
-
-def convert_objectid(obj):
-    """Convert ObjectId to string for JSON serialization."""
-    if isinstance(obj, list):
-        return [convert_objectid(item) for item in obj]
-    elif isinstance(obj, dict):
-        return {
-            key: str(value) if isinstance(value, ObjectId) else convert_objectid(value) 
-            for key, value in obj.items()
+    """Get the shared MongoDB client, creating it on first use."""
+    global _MONGO_CLIENT
+    if _MONGO_CLIENT is None:
+        mongo_uri = os.getenv("MONGO_URI")
+        if not mongo_uri:
+            raise ValueError("MONGO_URI not set in environment variables.")
+        _MONGO_CLIENT = MongoClient(
+            mongo_uri,
+            maxPoolSize=50,
+            minPoolSize=5,
+            serverSelectionTimeoutMS=3000,
+        )
+    return _MONGO_CLIENT
+
+def get_db():
+    """Get the application database handle."""
+    global _MONGO_DB
+    if _MONGO_DB is None:
+        _MONGO_DB = get_mongo_client()[MONGO_DB_NAME]
+    return _MONGO_DB
+
+def _sample_collection(collection_name):
+    """Sample one collection and describe its structure."""
+    collection = get_db()[collection_name]
+    # Only field names and BSON types leave the server, not document contents
+    sample_docs = list(collection.aggregate(COLLECTION_SAMPLE_PIPELINE))
+    if not sample_docs:
+        return collection_name, {
+            "fields": [],
+            "field_types": {},
+            "document_count": 0
         }
-    elif isinstance(obj, ObjectId):
-        return str(obj)
-    else:
-        return obj
+    
+    # Get all unique keys from sample documents
+    field_types = {}
+    for doc in sample_docs:
+        for field in doc["fields"]:
+            field_types.setdefault(field["k"], field["t"])
+    return collection_name, {
+        "fields": sorted(field_types),
+        "field_types": field_types,
+        "document_count": collection.estimated_document_count()
+    }
 
-# LangGraph Node Functions
-def write_query(state: State):
-    """Generate MongoDB query to fetch information."""
+def _load_collection_snapshot():
+    """Sample MongoDB and store a fresh ``(collection_info, schema_json)`` pair.
+
+    Raises if the database cannot be read; the cached snapshot is left as is.
+    Callers must hold _COLLECTION_SNAPSHOT_LOCK.
+    """
+    global _COLLECTION_SNAPSHOT
+    collection_names = get_db().list_collection_names()
+    collection_info = {}
+    
+    # Collections are sampled concurrently; the shared client is thread-safe
+    if collection_names:
+        workers = min(COLLECTION_SAMPLE_WORKERS, len(collection_names))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            collection_info = dict(executor.map(_sample_collection, collection_names))
+    
+    # Sorted keys keep the prompt prefix byte-identical between requests
+    schema_json = json.dumps(collection_info, indent=2, sort_keys=True, default=str)
+    
+    _COLLECTION_SNAPSHOT = (collection_info, schema_json, time.monotonic())
+    return collection_info, schema_json
+
+def _get_collection_snapshot(ttl):
+    """Return the cached ``(collection_info, schema_json)`` pair.
+
+    Both are rebuilt together when the snapshot is older than ``ttl``
+    seconds, so the schema is re-sampled and re-formatted only on a miss.
+    """
+    snapshot = _COLLECTION_SNAPSHOT
+    if snapshot is not None and time.monotonic() - snapshot[2] < ttl:
+        return snapshot[0], snapshot[1]
+
+    with _COLLECTION_SNAPSHOT_LOCK:
+        # Another thread may have rebuilt the snapshot while we waited
+        snapshot = _COLLECTION_SNAPSHOT
+        if snapshot is not None and time.monotonic() - snapshot[2] < ttl:
+            return snapshot[0], snapshot[1]
+        try:
+            return _load_collection_snapshot()
+        except Exception as e:
+            logger.error(f"Error getting collection info: {e}")
+            return {}, "{}"
+
+def get_collection_info(ttl=COLLECTION_INFO_TTL):
+    """Get information about available collections and their structure.
+
+    Results are cached for ``ttl`` seconds so repeated chat requests reuse the
+    same schema snapshot instead of re-sampling every collection.
+    """
+    return _get_collection_snapshot(ttl)[0]
+
+def get_collection_schema_json(ttl=COLLECTION_INFO_TTL):
+    """Get the collection info pre-formatted as JSON for LLM prompts."""
+    return _get_collection_snapshot(ttl)[1]
+
+def refresh_collection_info():
+    """Rebuild the schema snapshot now, raising if MongoDB cannot be read.
+
+    Readers keep getting the previous snapshot until the new one is swapped in.
+    """
+    with _COLLECTION_SNAPSHOT_LOCK:
+        return _load_collection_snapshot()[0]
+
+def materialize_result(result, limit=None):
+    """Read a query result into memory, capped at MAX_RESULTS documents.
+
+    Cursors are read in batches of CURSOR_BATCH_SIZE and closed as soon as
+    the cap is reached, so an unbounded find() never buffers a whole
+    collection. With ``limit``, only the first ``limit`` documents are read
+    and the rest are dropped instead of raising ResultTooLargeError.
+    """
+    read_count = MAX_RESULTS + 1 if limit is None else limit
+    if isinstance(result, (Cursor, CommandCursor)):
+        cursor = result.batch_size(min(CURSOR_BATCH_SIZE, read_count))
+        try:
+            result = list(islice(cursor, read_count))
+        finally:
+            cursor.close()
+    elif hasattr(result, '__iter__') and not isinstance(result, (str, dict, list)):
+        result = list(islice(result, read_count))
+    elif isinstance(result, list) and limit is not None:
+        result = result[:limit]
+    
+    if limit is None and isinstance(result, list) and len(result) > MAX_RESULTS:
+        raise ResultTooLargeError(
+            f"Query returned more than {MAX_RESULTS} documents; add a filter or limit()"
+        )
+    return result
+
+def _literal(node):
+    """Evaluate an AST node that must be a literal value.
+
+    Besides plain Python literals, ``ObjectId("<hex>")`` and
+    ``datetime(<ints>)`` are accepted so queries can match ids and dates.
+    """
+    if isinstance(node, ast.Dict):
+        if any(key is None for key in node.keys):
+            raise QueryError("Dict unpacking is not allowed")
+        return {_literal(key): _literal(value) for key, value in zip(node.keys, node.values)}
+    if isinstance(node, ast.List):
+        return [_literal(item) for item in node.elts]
+    if isinstance(node, ast.Tuple):
+        return tuple(_literal(item) for item in node.elts)
+    if isinstance(node, ast.Call):
+        return _construct_value(node)
     try:
-        collection_info = get_collection_info()
-        
-        prompt = f"""
-        Write a MongoDB query in Python syntax to answer the question: {state["question"]}
-        
-        Available collections and their structure:
-        {json.dumps(collection_info, indent=2, default=str)}
-        
-        Based on the collection structure shown above, generate a Python MongoDB query.
+        return ast.literal_eval(node)
+    except ValueError:
+        raise QueryError(f"Only literal arguments are allowed, got: {ast.unparse(node)}") from None
+
+def _construct_value(node):
+    """Build an ObjectId or datetime from a call node with constant arguments."""
+    name = node.func.id if isinstance(node.func, ast.Name) else None
+    if name not in QUERY_VALUE_CONSTRUCTORS:
+        raise QueryError(f"Only literal arguments are allowed, got: {ast.unparse(node)}")
+    if node.keywords or not all(isinstance(arg, ast.Constant) for arg in node.args):
+        raise QueryError(f"{name}() takes constant positional arguments only")
+    args = [arg.value for arg in node.args]
+    if name == "ObjectId" and (len(args) != 1 or not isinstance(args[0], str)):
+        raise QueryError("ObjectId() takes a single hex string")
+    if name == "datetime" and not all(type(arg) is int for arg in args):
+        raise QueryError("datetime() takes integer arguments only")
+    try:
+        return QUERY_VALUE_CONSTRUCTORS[name](*args)
+    except (InvalidId, TypeError, ValueError) as e:
+        raise QueryError(f"Invalid {name}(): {e}") from None
+
+def _is_db(node):
+    return isinstance(node, ast.Name) and node.id == "db"
+
+@lru_cache(maxsize=1024)
+def parse_query(query):
+    """Parse a generated query into ``(collection_name, calls)``.
+
+    Only ``db.<collection>`` / ``db["<collection>"]`` followed by one
+    whitelisted read method and optional cursor modifiers is accepted;
+    ``calls`` is a tuple of ``(method, args, kwargs)`` with literal arguments.
+    Parsed plans are memoized, so repeated queries skip parsing entirely.
+    """
+    try:
+        node = ast.parse(query.strip(), mode="eval").body
+    except SyntaxError as e:
+        raise QueryError(f"Invalid query syntax: {e.msg}") from None
+    
+    # Tolerate an outer list(...); materialize_result() reads cursors anyway
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+            and node.func.id == "list" and len(node.args) == 1 and not node.keywords):
+        node = node.args[0]
+    
+    calls = []
+    while isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Attribute):
+            raise QueryError("Only method calls on a db collection are allowed")
+        if any(keyword.arg is None for keyword in node.keywords):
+            raise QueryError("Keyword argument unpacking is not allowed")
+        args = tuple(_literal(arg) for arg in node.args)
+        kwargs = tuple((keyword.arg, _literal(keyword.value)) for keyword in node.keywords)
+        calls.append((node.func.attr, args, kwargs))
+        node = node.func.value
+    calls.reverse()
+    
+    if isinstance(node, ast.Attribute) and _is_db(node.value):
+        collection_name = node.attr
+    elif isinstance(node, ast.Subscript) and _is_db(node.value):
+        collection_name = _literal(node.slice)
+    else:
+        raise QueryError("Query must start with db.<collection>")
+    if not isinstance(collection_name, str):
+        raise QueryError("Collection name must be a string")
+    
+    if not calls or calls[0][0] not in QUERY_COLLECTION_METHODS:
+        allowed = ", ".join(sorted(QUERY_COLLECTION_METHODS))
+        raise QueryError(f"Query must call one of: {allowed}")
+    method, args, kwargs = calls[0]
+    if len(calls) > 1 and method != "find":
+        raise QueryError(f"Cursor modifiers are only allowed after find(), not {method}()")
+    for modifier, _, _ in calls[1:]:
+        if modifier not in QUERY_CURSOR_METHODS:
+            raise QueryError(f"Method '{modifier}' not allowed")
+    
+    if method == "aggregate":
+        pipeline = args[0] if args else dict(kwargs).get("pipeline", [])
+        for stage in pipeline:
+            if isinstance(stage, dict) and QUERY_WRITE_STAGES.intersection(stage):
+                raise QueryError("Aggregation write stages ($out, $merge) not allowed")
+    
+    return collection_name, tuple(calls)
+
+def run_query(query, limit=None):
+    """Run a generated query against the database without eval().
+
+    Blocking; the async graph nodes call it through asyncio.to_thread().
+    ``limit`` is passed on to materialize_result().
+    """
+    collection_name, calls = parse_query(query)
+    target = get_db()[collection_name]
+    # Arguments are copied because the parsed plan is shared through the cache
+    for method, args, kwargs in copy.deepcopy(calls):
+        target = getattr(target, method)(*args, **dict(kwargs))
+    return materialize_result(target, limit)
+
+def query_cache_key(query, limit=None):
+    """Result cache key for a query, or None if its results must not be cached.
+
+    The key is built from the parsed plan rather than the raw text, so
+    formatting differences share an entry without conflating string values.
+    The read limit is part of the key so truncated results stay separate.
+    """
+    plan = repr(parse_query(query))
+    if any(op in plan for op in QUERY_NONDETERMINISTIC_OPS):
+        return None
+    return MONGO_DB_NAME, limit, plan
+
+def clear_query_cache():
+    """Drop all cached query results."""
+    with _QUERY_CACHE_LOCK:
+        _QUERY_CACHE.clear()
+
+def normalize_question(question):
+    """Collapse whitespace so equivalent questions share LLM cache entries."""
+    return " ".join(question.split())
+
+def build_query_instructions(schema_json):
+    """Build the static part of the query-writing prompt.
+
+    ``schema_json`` comes pre-formatted from the schema snapshot, so the
+    prefix stays byte-identical between requests and can be served from
+    prompt caches.
+    """
+    return f"""
+        You write MongoDB queries in Python syntax.
         The code should use the 'db' variable which is already connected to the database.
         
         Example patterns:
-        - Find documents: list(db.collection_name.find({{"field": "value"}}))
+        - Find documents: db.collection_name.find({{"field": "value"}})
         - Count documents: db.collection_name.count_documents({{"field": "value"}})
-        - Aggregate: list(db.collection_name.aggregate([{{"$match": {{"field": "value"}}}}]))
-        - Find with projection: list(db.collection_name.find({{"field": "value"}}, {{"field1": 1, "field2": 1}}))
-        - Sort and limit: list(db.collection_name.find({{"field": "value"}}).sort("field", 1).limit(10))
+        - Aggregate: db.collection_name.aggregate([{{"$match": {{"field": "value"}}}}])
+        - Find with projection: db.collection_name.find({{"field": "value"}}, {{"field1": 1, "field2": 1}})
+        - Sort and limit: db.collection_name.find({{"field": "value"}}).sort("field", 1).limit(10)
         
         Important: 
-        - Return only the Python code that can be executed with eval()
-        - Use only READ operations (find, count_documents, aggregate)
+        - Return only a single Python expression starting with db
+        - Return cursors as-is; do not wrap them in list()
+        - Use only READ operations (find, find_one, count_documents, aggregate)
+        - Only sort, limit and skip may be chained after find
+        - Use literal values only; no variables, functions or imports
+        - The only calls allowed inside arguments are ObjectId("<24-char hex>") for
+          objectId fields and datetime(year, month, day[, hour, minute, second]) for dates
         - Do not use any write operations (insert, update, delete, drop)
-        """
         
-        structured_llm = llm.with_structured_output(QueryOutput)
-        result = structured_llm.invoke(prompt)
+        Available collections and their structure:
+        {schema_json}
+        
+        Based on the collection structure shown above, generate a Python MongoDB query.
+        """
+
+# LangGraph Node Functions
+async def write_query(state: State):
+    """Generate MongoDB query to fetch information."""
+    try:
+        schema_json = await asyncio.to_thread(get_collection_schema_json)
+        
+        # Static instructions and schema first, the question last, so providers
+        # with prefix caching can reuse the system message. (Anthropic models
+        # would additionally take cache_control={"type": "ephemeral"} here.)
+        messages = [
+            SystemMessage(content=build_query_instructions(schema_json)),
+            HumanMessage(content=f"Write a MongoDB query to answer the question: {state['question']}"),
+        ]
+        
+        # Sync client in a worker thread: under runserver each request gets a new
+        # event loop, and ChatMistralAI's pooled async client is bound to the first
+        result = await asyncio.to_thread(structured_llm.invoke, messages)
         return {"query": result["query"]}
     except Exception as e:
-        logger.error(f"Error generating query: {e}")
-        return {"query": f"# Error generating query: {str(e)}"}
+        error_msg = f"Error generating query: {str(e)}"
+        logger.error(error_msg)
+        return {"query": f"# {error_msg}", "error": error_msg}
+
+def route_after_write_query(state: State):
+    """Skip execution and answering when query generation failed."""
+    return "skip" if state.get("error") else "run"
 
-def execute_query(state: State):
+async def execute_query(state: State):
     """Execute MongoDB query."""
     try:
-        client = get_mongo_client()
-        db = client["app-dev"]
-        
-        # Basic security check
-        dangerous_operations = ['drop', 'delete', 'remove', 'update', 'replace', 'insert', 
-                               'create', 'rename', 'aggregate_write']
-        query_lower = state["query"].lower()
-        for op in dangerous_operations:
-            if op in query_lower:
-                raise Exception(f"Dangerous operation '{op}' not allowed")
+        # Serve repeated queries from the result cache; parse_query() only
+        # accepts whitelisted read methods, so every cached query is read-only
+        limit = state.get("result_limit")
+        cache_key = query_cache_key(state["query"], limit)
+        if cache_key is not None:
+            with _QUERY_CACHE_LOCK:
+                cached = _QUERY_CACHE.get(cache_key, _CACHE_MISS)
+            if cached is not _CACHE_MISS:
+                return {"result": cached}
         
         # Execute the query
-        result = eval(state["query"])
-        
-        # Convert cursor to list if needed
-        if hasattr(result, 'to_list'):
-            result = list(result)
-        elif hasattr(result, '__iter__') and not isinstance(result, (str, dict)):
-            result = list(result)
+        result = await asyncio.to_thread(run_query, state["query"], limit)
         
-        # Convert ObjectId to string for JSON serialization
-        result = convert_objectid(result)
+        if cache_key is not None and _QUERY_CACHE.getsizeof(result) <= QUERY_CACHE_MAX_ENTRY_DOCS:
+            with _QUERY_CACHE_LOCK:
+                _QUERY_CACHE[cache_key] = result
         
-        return {"result": json.dumps(result, default=str, ensure_ascii=False)}
+        # Documents stay as the dicts PyMongo's C extension decoded; orjson
+        # stringifies ObjectIds via its default hook when the result is
+        # serialized. RawBSONDocument is deliberately not used: orjson cannot
+        # encode it, and bson.json_util would switch responses to Extended JSON.
+        return {"result": result}
     
+    except ResultTooLargeError:
+        raise
     except Exception as e:
         error_msg = f"Error executing query: {str(e)}"
         logger.error(error_msg)
         return {"result": error_msg}
 
-def generate_answer(state: State):
+async def generate_answer(state: State):
     """Answer question using retrieved information as context."""
     try:
+        result = state["result"]
+        if not isinstance(result, str):
+            result = orjson.dumps(result, default=str).decode()
         prompt = (
             "Given the following user question, corresponding MongoDB query, "
             "and MongoDB result, provide a clear and helpful answer to the user's question.\n\n"
             f'Question: {state["question"]}\n'
             f'MongoDB Query: {state["query"]}\n'
-            f'MongoDB Result: {state["result"]}\n\n'
+            f'MongoDB Result: {result}\n\n'
             "Please provide a natural language summary of the results. If the result is empty, "
             "explain that no matching documents were found. If there's an error, explain what went wrong."
         )
-        response = llm.invoke(prompt)
+        response = await asyncio.to_thread(llm.invoke, prompt)
         return {"answer": response.content}
     except Exception as e:
         error_msg = f"Error generating answer: {str(e)}"
@@ -243,15 +576,14 @@ def generate_answer(state: State):
 
 # Django Views
 @csrf_exempt
-def health_check(request):
+async def health_check(request):
     """Health check endpoint."""
     try:
         # Test MongoDB connection
-        client = get_mongo_client()
-        db = client["app-dev"]
-        collections = db.list_collection_names()
+        db = get_db()
+        collections = await asyncio.to_thread(db.list_collection_names)
         
-        return JsonResponse({
+        return ORJsonResponse({
             "status": "healthy", 
             "message": "MongoDB AI Chat API is running",
             "mongodb_connected": True,
@@ -260,7 +592,7 @@ def health_check(request):
         })
     except Exception as e:
         logger.error(f"Health check failed: {e}")
-        return JsonResponse({
+        return ORJsonResponse({
             "status": "error",
             "message": f"Health check failed: {str(e)}",
             "mongodb_connected": False
@@ -268,142 +600,193 @@ def health_check(request):
 
 @csrf_exempt
 @require_http_methods(["GET"])
-def get_collections(request):
+async def get_collections(request):
     """Get collection information endpoint."""
     try:
-        collection_info = get_collection_info()
-        return JsonResponse({
+        collection_info = await asyncio.to_thread(get_collection_info)
+        return ORJsonResponse({
             "success": True, 
             "collections": collection_info
         })
     except Exception as e:
         logger.error(f"Error getting collections: {e}")
-        return JsonResponse({
+        return ORJsonResponse({
             "success": False, 
             "error": str(e)
         }, status=500)
 
+@csrf_exempt
+@require_http_methods(["GET"])
+async def count_collection_documents(request, collection_name):
+    """Exact document count for one collection, optionally filtered.
+
+    Collection info only reports estimated counts; this runs count_documents
+    on demand for callers that need an exact figure. The ``filter`` query
+    parameter is MongoDB Extended JSON.
+    """
+    try:
+        db = get_db()
+        if collection_name not in await asyncio.to_thread(db.list_collection_names):
+            return ORJsonResponse({
+                "success": False,
+                "error": f"Collection '{collection_name}' not found"
+            }, status=404)
+        
+        # Extended JSON, so filters can use {"$oid": ...} and {"$date": ...}
+        query_filter = json_util.loads(request.GET.get('filter', '{}'))
+        if not isinstance(query_filter, dict):
+            return ORJsonResponse({
+                "success": False,
+                "error": "Filter must be a JSON object"
+            }, status=400)
+        
+        document_count = await asyncio.to_thread(
+            db[collection_name].count_documents, query_filter
+        )
+        return ORJsonResponse({
+            "success": True,
+            "collection": collection_name,
+            "filter": query_filter,
+            "document_count": document_count
+        })
+    except (ValueError, TypeError, BSONError) as e:
+        return ORJsonResponse({
+            "success": False,
+            "error": f"Filter must be valid Extended JSON: {e}"
+        }, status=400)
+    except Exception as e:
+        logger.error(f"Error counting documents: {e}")
+        return ORJsonResponse({
+            "success": False,
+            "error": str(e)
+        }, status=500)
+
 @csrf_exempt
 @require_http_methods(["POST"])
-def chat(request):
+async def refresh_collections(request):
+    """Invalidate the cached collection info and rebuild it."""
+    try:
+        collection_info = await asyncio.to_thread(refresh_collection_info)
+        return ORJsonResponse({
+            "success": True, 
+            "collections": collection_info
+        })
+    except Exception as e:
+        logger.error(f"Error refreshing collections: {e}")
+        return ORJsonResponse({
+            "success": False, 
+            "error": str(e)
+        }, status=500)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def clear_query_cache_endpoint(request):
+    """Invalidate all cached query results."""
+    clear_query_cache()
+    return ORJsonResponse({"success": True})
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def chat(request):
     """Generate MongoDB query from natural language question."""
     try:
-        data = json.loads(request.body)
-        question = data.get('question', '').strip()
+        data = orjson.loads(request.body)
+        question = normalize_question(data.get('question', ''))
         
         if not question:
-            return JsonResponse({
+            return ORJsonResponse({
                 "success": False,
                 "error": "Question is required"
             }, status=400)
         
-        logger.info(f"Generating query for question: {question}")
+        logger.info("Generating query for question: %s", question)
         
         # Use LangGraph to generate query
         session_id = "api_session_" + str(os.urandom(4).hex())
         config = {"configurable": {"thread_id": session_id}}
         
         initial_state = {"question": question}
-        result = write_query(initial_state)
+        result = await write_query(initial_state)
         
-        logger.info(f"Generated query: {result['query']}")
+        logger.info("Generated query: %s", result["query"])
         
-        return JsonResponse({
+        return ORJsonResponse({
             "success": True,
             "question": question,
             "query": result["query"]
         })
     except Exception as e:
         logger.error(f"Chat error: {str(e)}")
-        return JsonResponse({
+        return ORJsonResponse({
             "success": False,
             "error": str(e)
         }, status=500)
 
 @csrf_exempt
 @require_http_methods(["POST"])
-def execute_query_endpoint(request):
+async def execute_query_endpoint(request):
     """Execute a specific MongoDB query and generate natural language answer."""
     try:
-        data = json.loads(request.body)
-        question = data.get('question', '').strip()
+        data = orjson.loads(request.body)
+        question = normalize_question(data.get('question', ''))
         query = data.get('query', '').strip()
         
         if not question or not query:
-            return JsonResponse({
+            return ORJsonResponse({
                 "success": False,
                 "error": "Question and query are required"
             }, status=400)
         
-        logger.info(f"Executing query: {query}")
-        
-        # Execute query
-        client = get_mongo_client()
-        db = client["app-dev"]
+        logger.info("Executing query: %s", query)
         
-        # Basic security check
-        dangerous_operations = ['drop', 'delete', 'remove', 'update', 'replace', 'insert',
-                               'create', 'rename', 'aggregate_write']
-        query_lower = query.lower()
-        for op in dangerous_operations:
-            if op in query_lower:
-                raise Exception(f"Dangerous operation '{op}' not allowed")
-        
-        # Execute the query
-        result = eval(query)
-        
-        if hasattr(result, 'to_list'):
-            result = list(result)
-        elif hasattr(result, '__iter__') and not isinstance(result, (str, dict)):
-            result = list(result)
-        
-        # Limit to first 10 results
-        if isinstance(result, list):
-            result = result[:10]
-        
-        # Convert ObjectId to string for JSON serialization
-        result = convert_objectid(result)
-        
-        logger.info(f"Query result count: {len(result) if isinstance(result, list) else 'N/A'}")
-        
-        # Generate answer using the complete state
-        state = {
+        # Run the execute/answer half of the LangGraph flow
+        final_result = await exec_graph.ainvoke({
             "question": question,
             "query": query,
-            "result": json.dumps(result, default=str, ensure_ascii=False)
-        }
+            "result_limit": EXECUTE_RESULT_LIMIT
+        })
         
-        answer_result = generate_answer(state)
+        # execute_query read at most EXECUTE_RESULT_LIMIT documents
+        result = final_result["result"]
         
-        return JsonResponse({
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Query result count: %s", len(result) if isinstance(result, list) else "N/A")
+        
+        return ORJsonResponse({
             "success": True,
             "question": question,
             "query": query,
             "result": result,
-            "answer": answer_result["answer"]
+            "answer": final_result["answer"]
         })
+    except ResultTooLargeError as e:
+        logger.warning(f"Execute query error: {str(e)}")
+        return ORJsonResponse({
+            "success": False,
+            "error": str(e)
+        }, status=413)
     except Exception as e:
         logger.error(f"Execute query error: {str(e)}")
-        return JsonResponse({
+        return ORJsonResponse({
             "success": False,
             "error": str(e)
         }, status=500)
 
 @csrf_exempt
 @require_http_methods(["POST"])
-def chat_complete(request):
+async def chat_complete(request):
     """Complete chat flow - generate query, execute, and generate answer in one call."""
     try:
-        data = json.loads(request.body)
-        question = data.get('question', '').strip()
+        data = orjson.loads(request.body)
+        question = normalize_question(data.get('question', ''))
         
         if not question:
-            return JsonResponse({
+            return ORJsonResponse({
                 "success": False,
                 "error": "Question is required"
             }, status=400)
         
-        logger.info(f"Complete chat flow for question: {question}")
+        logger.info("Complete chat flow for question: %s", question)
         
         # Use complete LangGraph flow
         session_id = "api_session_" + str(os.urandom(4).hex())
@@ -412,26 +795,34 @@ def chat_complete(request):
         initial_state = {"question": question}
         
         # Run through the complete graph
-        final_result = graph.invoke(initial_state, config)
+        final_result = await graph.ainvoke(initial_state, config)
         
-        # Parse result to get actual data for JSON response
-        try:
-            result_data = json.loads(final_result["result"])
-        except:
-            result_data = final_result["result"]
+        # The graph stops right after write_query if no query could be generated
+        if final_result.get("error"):
+            return ORJsonResponse({
+                "success": False,
+                "question": question,
+                "error": final_result["error"]
+            }, status=500)
         
-        logger.info(f"Complete chat flow completed successfully")
+        logger.info("Complete chat flow completed successfully")
         
-        return JsonResponse({
+        return ORJsonResponse({
             "success": True,
             "question": question,
             "query": final_result["query"],
-            "result": result_data,
+            "result": final_result["result"],
             "answer": final_result["answer"]
         })
+    except ResultTooLargeError as e:
+        logger.warning(f"Chat complete error: {str(e)}")
+        return ORJsonResponse({
+            "success": False,
+            "error": str(e)
+        }, status=413)
     except Exception as e:
         logger.error(f"Chat complete error: {str(e)}")
-        return JsonResponse({
+        return ORJsonResponse({
             "success": False,
             "error": str(e)
         }, status=500)
@@ -440,6 +831,9 @@ def chat_complete(request):
 urlpatterns = [
     path('health/', health_check, name='health'),
     path('api/collections/', get_collections, name='collections'),
+    path('api/collections/refresh/', refresh_collections, name='refresh_collections'),
+    path('api/collections/<str:collection_name>/count/', count_collection_documents, name='count_documents'),
+    path('api/query-cache/clear/', clear_query_cache_endpoint, name='clear_query_cache'),
     path('api/chat/', chat, name='chat'),
     path('api/execute-query/', execute_query_endpoint, name='execute_query'),
     path('api/chat-complete/', chat_complete, name='chat_complete'),
@@ -448,9 +842,12 @@ urlpatterns = [
 # WSGI Application
 application = get_wsgi_application()
 
+# ASGI Application (async views only overlap I/O under an ASGI server)
+asgi_application = get_asgi_application()
+
 def initialize_services():
     """Initialize all required services."""
-    global llm, graph
+    global llm, structured_llm, graph, exec_graph
     
     print("🚀 MongoDB AI Chat API Starting...")
     
@@ -468,17 +865,24 @@ def initialize_services():
     # Initialize LangChain LLM
     try:
         llm = init_chat_model("mistral-large-latest", model_provider="mistralai")
+        structured_llm = llm.with_structured_output(QueryOutput)
         print("✅ Mistral LLM initialized successfully")
     except Exception as e:
         print(f"❌ Mistral LLM initialization failed: {e}")
         return False
     
+    # Cache LLM responses so repeated questions skip the Mistral round-trip
+    try:
+        set_llm_cache(SQLiteCache(database_path=LLM_CACHE_PATH))
+        print(f"✅ LLM cache enabled: {LLM_CACHE_PATH}")
+    except Exception as e:
+        print(f"⚠️  Warning: LLM cache disabled: {e}")
+    
     # Test MongoDB connection
     try:
-        client = get_mongo_client()
-        db = client["app-dev"]
+        db = get_db()
         collections = db.list_collection_names()
-        print(f"✅ Connected to MongoDB: app-dev")
+        print(f"✅ Connected to MongoDB: {MONGO_DB_NAME}")
         print(f"✅ Collections found: {collections}")
         if not collections:
             print("⚠️  Warning: No collections found in database")
@@ -493,11 +897,23 @@ def initialize_services():
         builder.add_node("execute_query", execute_query)
         builder.add_node("generate_answer", generate_answer)
 
-        builder.add_edge("write_query", "execute_query")
+        builder.add_conditional_edges(
+            "write_query",
+            route_after_write_query,
+            {"skip": langgraph.END, "run": "execute_query"},
+        )
         builder.add_edge("execute_query", "generate_answer")
 
         builder.set_entry_point("write_query")
         graph = builder.compile()
+        
+        # Same flow for a query supplied by the client
+        exec_builder = langgraph.StateGraph(State)
+        exec_builder.add_node("execute_query", execute_query)
+        exec_builder.add_node("generate_answer", generate_answer)
+        exec_builder.add_edge("execute_query", "generate_answer")
+        exec_builder.set_entry_point("execute_query")
+        exec_graph = exec_builder.compile()
         print("✅ LangGraph initialized successfully")
     except Exception as e:
         print(f"❌ LangGraph initialization failed: {e}")
@@ -505,15 +921,25 @@ def initialize_services():
     
     return True
 
+# WSGI/ASGI servers (e.g. `uvicorn app:asgi_application`) import this module
+# instead of running it, so services must be initialized at import time there
+if __name__ != "__main__":
+    if not initialize_services():
+        raise RuntimeError("MongoDB AI Chat API failed to initialize")
+
 if __name__ == "__main__":
     if not initialize_services():
         sys.exit(1)
     
     print("🎉 All systems ready!")
     print("📡 Starting Django server on http://localhost:5000")
+    print("   (for concurrent requests, serve app:asgi_application with an ASGI server such as uvicorn)")
     print("\nAvailable endpoints:")
     print("- GET  /health/ - Health check")
     print("- GET  /api/collections/ - Get collection info")
+    print("- POST /api/collections/refresh/ - Refresh cached collection info")
+    print("- GET  /api/collections/<name>/count/ - Exact document count")
+    print("- POST /api/query-cache/clear/ - Clear cached query results")
     print("- POST /api/chat/ - Generate query only")
     print("- POST /api/execute-query/ - Execute specific query")
     print("- POST /api/chat-complete/ - Complete chat flow")